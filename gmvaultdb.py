@@ -113,7 +113,7 @@ def gui(dbfile):
     # folderlist = QListWidget()
     # folderlist.clicked.connect(model_update)
     foldertree = QTreeWidget()
-    foldertree.setColumnCount(2)
+    foldertree.setColumnCount(3) # name, full label (hidden), message count
     foldertree.hideColumn(1)
     foldertree.clicked.connect(model_update)
 
@@ -165,11 +165,19 @@ def gui(dbfile):
         print("cannot open DB")
         return
 
-    myquery2 = db.exec_("select gmail_labels labels from messages group by labels order by labels")
+    if 'label_stats' in db.tables(): # O(labels) instead of a full scan of messages
+        myquery2 = db.exec_("select label, count from label_stats order by label")
+    else: # DB created before the stats tables existed (run "rebuildstats" to create them)
+        myquery2 = db.exec_("select gmail_labels labels, count(*) from messages group by labels order by labels")
     itemlist = {}
+    foldercount = {}
     while myquery2.next():
         # folderlist.addItem(myquery2.value(0))
-        createtreeitem(myquery2.value(0))
+        item = createtreeitem(myquery2.value(0))
+        while item != None: # the badge of each folder counts the messages of its whole subtree
+            foldercount[item.text(1)] = foldercount.get(item.text(1), 0) + myquery2.value(1)
+            item.setText(2, str(foldercount[item.text(1)]))
+            item = item.parent()
 
     model=QSqlTableModel()
     model_update()
@@ -291,6 +299,7 @@ def scan_mbox(mboxfile, outdir):
         os.makedirs(outdir)
     if os.path.exists(outdir+'/mails.db'):
         db=MDB(outdir+'/mails.db') # don't "drop table if exists"
+        db.createstats()
     else:
         db=MDB(outdir+'/mails.db')
         db.createdb()
@@ -338,6 +347,7 @@ def scandir_gmvault(rootdir, outdir, includelist=[]): # '2009-01'
         os.makedirs(outdir)
     if os.path.exists(outdir+'/mails.db'):
         db=MDB(outdir+'/mails.db') # don't "drop table if exists"
+        db.createstats()
     else:
         db=MDB(outdir+'/mails.db')
         db.createdb()
@@ -619,6 +629,59 @@ class MDB():
             PRAGMA main.locking_mode=EXCLUSIVE;
             PRAGMA main.synchronous=NORMAL;
         ''') # PRAGMA main.journal_mode=WAL;
+        self.createstats(drop=True)
+
+    # Aggregate tables maintained by addmail() within the same transaction as the message itself, so that the GUI and statistics don't need to scan the whole messages table
+    stats_fill = '''
+        insert into label_stats select gmail_labels, count(*), sum(size), sum(sizeatt), sum(numatt) from messages group by gmail_labels;
+        insert into month_stats select strftime('%Y-%m', datetime, 'unixepoch') month, count(*), sum(size), sum(sizeatt), sum(numatt) from messages group by month;
+        insert into thread_stats select t.gmail_threadid, t.first_date, t.last_date, p.participants, t.count
+            from (select gmail_threadid, min(datetime) first_date, max(datetime) last_date, count(*) count from messages group by gmail_threadid) t
+            left join (select gmail_threadid, group_concat(msgfrom, '¤') participants from (select distinct gmail_threadid, msgfrom from messages where msgfrom is not null) group by gmail_threadid) p
+            on t.gmail_threadid=p.gmail_threadid;
+    '''
+
+    def execscript_atomic(self, script):
+        # executescript() commits any pending transaction and then runs in autocommit mode => explicit begin/commit so that an interrupted (re)build never leaves partial stats tables
+        try:
+            self.conn.executescript("begin;" + script + "commit;")
+        except BaseException: # including KeyboardInterrupt during a long rebuild
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+
+    def createstats(self, drop=False):
+        if not drop and self.conn.execute("select name from sqlite_master where type='table' and name='label_stats'").fetchone() != None:
+            return
+        self.execscript_atomic('''
+            drop table if exists label_stats;
+            drop table if exists thread_stats;
+            drop table if exists month_stats;
+            create table label_stats(
+                label text primary key,
+                count integer,
+                size integer,
+                sizeatt integer,
+                numatt integer
+            );
+            create table thread_stats(
+                thread_id integer primary key,
+                first_date integer,
+                last_date integer,
+                participants text,
+                count integer
+            );
+            create table month_stats(
+                month text primary key,
+                count integer,
+                size integer,
+                sizeatt integer,
+                numatt integer
+            );
+        ''' + self.stats_fill) # fill from the messages already stored (e.g. existing DB created before the stats tables)
+
+    def rebuildstats(self):
+        self.createstats(drop=True) # drop + create + fill in a single transaction
 
     def checkmail(self, gm_id):
         cur = self.conn.cursor()
@@ -635,6 +698,31 @@ class MDB():
             m["Subject"], m['Body'], m['BodyHTML'], '¤'.join(m["Attachments"]), m['flags'], m["signature"],
             m["Size"],m["SizeAtt"],m["NumAtt"]
         ))
+        self.updatestats(m)
+
+    def updatestats(self, m):
+        # "update then insert" rather than "insert ... on conflict" so that NULL labels are also merged into a single row
+        cur = self.conn.cursor()
+        date = int(m['Date_parsed'])
+        month = time.strftime('%Y-%m', time.gmtime(date)) # same as strftime('%Y-%m', datetime, 'unixepoch') in stats_fill
+        sizes = (m["Size"], m["SizeAtt"], m["NumAtt"])
+        cur.execute("update label_stats set count=count+1, size=size+?, sizeatt=sizeatt+?, numatt=numatt+? where label is ?", sizes + (m['labelstr'],))
+        if cur.rowcount==0:
+            cur.execute("insert into label_stats values (?,1,?,?,?)", (m['labelstr'],) + sizes)
+        cur.execute("update month_stats set count=count+1, size=size+?, sizeatt=sizeatt+?, numatt=numatt+? where month=?", sizes + (month,))
+        if cur.rowcount==0:
+            cur.execute("insert into month_stats values (?,1,?,?,?)", (month,) + sizes)
+
+        rs = cur.execute("select participants from thread_stats where thread_id=?", (m["thread_id"],)).fetchone()
+        if rs==None:
+            cur.execute("insert into thread_stats values (?,?,?,?,1)", (m["thread_id"], date, date, m['From']))
+        else:
+            participants = rs[0].split('¤') if rs[0] else []
+            if m['From']!=None and not m['From'] in participants:
+                participants.append(m['From'])
+            cur.execute("update thread_stats set first_date=min(first_date,?), last_date=max(last_date,?), participants=?, count=count+1 where thread_id=?", (
+                date, date, '¤'.join(participants) if participants!=[] else None, m["thread_id"]
+            ))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -651,6 +739,9 @@ if __name__ == "__main__":
     parser_gui = subparsers.add_parser('gui', help="Launch GUI")
     parser_gui.add_argument("dbfile", help="DB file")
 
+    parser_stats = subparsers.add_parser('rebuildstats', help="Rebuild the label/thread/month stats tables of an existing DB")
+    parser_stats.add_argument("dbfile", help="DB file")
+
     args = parser.parse_args()
 
     if args.subcommand=="gmvault":
@@ -659,3 +750,10 @@ if __name__ == "__main__":
         scan_mbox(args.mboxfile,args.outdir)
     elif args.subcommand=="gui":
         gui(args.dbfile)
+    elif args.subcommand=="rebuildstats":
+        if not os.path.exists(args.dbfile): # sqlite3.connect() would silently create an empty DB
+            sys.exit("cannot open DB: " + args.dbfile)
+        db=MDB(args.dbfile)
+        if db.conn.execute("select name from sqlite_master where type='table' and name='messages'").fetchone() == None:
+            sys.exit("not a gmvaultdb DB (no messages table): " + args.dbfile)
+        db.rebuildstats()